@@ -0,0 +1,38 @@
+"""Compile the calculator kernels ahead of time with Numba.
+
+Running ``python build_kernels.py`` writes the ``calculator_kernels``
+extension module next to this file. calculator_server imports it at startup
+when present, so the server needs neither numba nor JIT compilation; without
+it the kernels run as plain Python. The extension records a
+hash of calculator_kernel_sources.py and is ignored once that file changes,
+so rebuild after editing a kernel or the input limits.
+
+numba.pycc is deprecated upstream and emits NumbaPendingDeprecationWarning.
+"""
+import os
+import sys
+
+from numba.pycc import CC
+
+from calculator_kernel_sources import KERNEL_SIGNATURE, KERNELS_HASH, KERNEL_SOURCES
+
+def kernels_hash() -> int:
+    return KERNELS_HASH
+
+def build(output_dir: str = os.path.dirname(os.path.abspath(__file__))) -> str:
+    """Compile the calculator_kernels extension into ``output_dir``.
+
+    Returns:
+        The directory containing the extension
+    """
+    cc = CC("calculator_kernels")
+    cc.output_dir = output_dir
+    for name, kernel in KERNEL_SOURCES.items():
+        cc.export(name, KERNEL_SIGNATURE)(kernel)
+    cc.export("kernels_hash", "int64()")(kernels_hash)
+    cc.compile()
+    return output_dir
+
+if __name__ == "__main__":
+    output_dir = build(*sys.argv[1:2])
+    print(f"Built calculator_kernels in {output_dir}")
@@ -0,0 +1,77 @@
+"""Arithmetic kernels shared by the calculator server and build_kernels.py.
+
+The kernels are plain Python so they can be imported without numba. Each one
+repeats the range checks of the server's Python path and returns NaN instead
+of raising, so the tool wrappers can bail out to the fully validated Python
+path whenever a kernel cannot produce a trustworthy result. calculator_server
+loads them ahead-of-time compiled from the calculator_kernels extension when
+present, or JIT-compiles them with numba on request; this module stays free
+of both.
+"""
+import hashlib
+import math
+import os
+from typing import Callable, Dict
+
+# Security constants; the compiled kernels bake these in
+MAX_INPUT_VALUE: float = 1e308  # Near float max to prevent overflow
+MIN_INPUT_VALUE: float = -1e308
+MAX_EXPONENT: int = 1000  # Largest absolute exponent accepted by power()
+
+KERNEL_SIGNATURE: str = "float64(float64, float64)"
+
+def _add_kernel(a: float, b: float) -> float:
+    if not (MIN_INPUT_VALUE <= a <= MAX_INPUT_VALUE and MIN_INPUT_VALUE <= b <= MAX_INPUT_VALUE):
+        return math.nan
+    return a + b
+
+def _subtract_kernel(a: float, b: float) -> float:
+    if not (MIN_INPUT_VALUE <= a <= MAX_INPUT_VALUE and MIN_INPUT_VALUE <= b <= MAX_INPUT_VALUE):
+        return math.nan
+    return a - b
+
+def _multiply_kernel(a: float, b: float) -> float:
+    if not (MIN_INPUT_VALUE <= a <= MAX_INPUT_VALUE and MIN_INPUT_VALUE <= b <= MAX_INPUT_VALUE):
+        return math.nan
+    return a * b
+
+def _divide_kernel(a: float, b: float) -> float:
+    if not (MIN_INPUT_VALUE <= a <= MAX_INPUT_VALUE and MIN_INPUT_VALUE <= b <= MAX_INPUT_VALUE) or b == 0:
+        return math.nan
+    result = a / b
+    # Only a divisor smaller than 1 in magnitude can push the quotient out of range
+    if -1.0 < b < 1.0 and not MIN_INPUT_VALUE <= result <= MAX_INPUT_VALUE:
+        return math.nan
+    return result
+
+def _power_kernel(base: float, exponent: float) -> float:
+    if not (MIN_INPUT_VALUE <= base <= MAX_INPUT_VALUE and MIN_INPUT_VALUE <= exponent <= MAX_INPUT_VALUE):
+        return math.nan
+    if abs(exponent) > MAX_EXPONENT:
+        return math.nan
+    if base == 0 and exponent <= 0:
+        return math.nan
+    if base < 0 and exponent != math.floor(exponent):
+        return math.nan
+    result = math.pow(base, exponent)
+    if not MIN_INPUT_VALUE <= result <= MAX_INPUT_VALUE:
+        return math.nan
+    return result
+
+# Kernel sources keyed by the name build_kernels.py exports them under
+KERNEL_SOURCES: Dict[str, Callable[[float, float], float]] = {
+    "add": _add_kernel,
+    "subtract": _subtract_kernel,
+    "multiply": _multiply_kernel,
+    "divide": _divide_kernel,
+    "power": _power_kernel,
+}
+
+def _source_hash() -> int:
+    """Hash this file into a positive int64, so a prebuilt extension can prove it is current."""
+    with open(os.path.abspath(__file__), "rb") as f:
+        digest = hashlib.sha256(f.read()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+# Exported by the extension as kernels_hash(); a mismatch means it is stale
+KERNELS_HASH: int = _source_hash()
@@ -1,26 +1,80 @@
 from mcp.server.fastmcp import FastMCP
+import atexit
 import logging
+import logging.handlers
 import math
-from typing import Union, NoReturn, Any
-
-# Configure logging with better formatting and file output
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('calculator_server.log'),
-        logging.StreamHandler()
-    ]
+import os
+import queue
+import sys
+import operator
+from typing import Callable, Dict, Tuple, Union, NoReturn, Any
+
+from calculator_kernel_sources import (
+    KERNEL_SIGNATURE,
+    KERNELS_HASH,
+    KERNEL_SOURCES,
+    MAX_EXPONENT,
+    MAX_INPUT_VALUE,
+    MIN_INPUT_VALUE,
 )
+
 logger: logging.Logger = logging.getLogger(__name__)
 
 mcp: FastMCP = FastMCP("Calculator MCP Server")
 
-# Security constants
-MAX_INPUT_VALUE: float = 1e308  # Near float max to prevent overflow
-MIN_INPUT_VALUE: float = -1e308
+# Security constants (the input range and exponent limit live with the kernels)
 MAX_PRECISION: int = 15  # Maximum decimal places to prevent precision issues
 
+def _load_kernels() -> Dict[str, Callable[[float, float], float]]:
+    """Pick the implementation of the arithmetic kernels.
+
+    Prefers the calculator_kernels extension built by build_kernels.py, which
+    loads without importing numba, as long as it was built from the current
+    calculator_kernel_sources.py. Otherwise the kernels run as plain Python:
+    calling a numba dispatcher costs more than these one-line kernels save, so
+    JIT compilation is only used when CALCULATOR_NUMBA_JIT=1 opts into it.
+
+    Returns:
+        Kernel callables keyed by tool name
+    """
+    try:
+        import calculator_kernels
+    except ImportError:
+        calculator_kernels = None
+    if calculator_kernels is not None:
+        if calculator_kernels.kernels_hash() == KERNELS_HASH:
+            return {name: getattr(calculator_kernels, name) for name in KERNEL_SOURCES}
+        logger.warning("Ignoring stale calculator_kernels extension; rebuild it with build_kernels.py")
+
+    if os.getenv("CALCULATOR_NUMBA_JIT") != "1":
+        return dict(KERNEL_SOURCES)
+    try:
+        from numba import njit
+    except ImportError:  # numba is optional; the kernels then run as plain Python
+        logger.warning("CALCULATOR_NUMBA_JIT=1 but numba is not installed; using plain Python kernels")
+        return dict(KERNEL_SOURCES)
+    return {name: njit(KERNEL_SIGNATURE, cache=True)(kernel) for name, kernel in KERNEL_SOURCES.items()}
+
+_KERNELS: Dict[str, Callable[[float, float], float]] = _load_kernels()
+
+# Error messages, built once at import time
+_ERR_NOT_NUMBER: str = "Parameter '{0}' must be a number (int or float), but received {1}: {2}"
+_ERR_NAN: str = "Parameter '{0}' cannot be NaN (Not a Number)"
+_ERR_INFINITE: str = "Parameter '{0}' cannot be infinity"
+_ERR_OUT_OF_RANGE: str = ("Parameter '{0}' value {1} is outside the allowed range "
+                          f"[{MIN_INPUT_VALUE}, {MAX_INPUT_VALUE}]")
+_ERR_DIVISION_BY_ZERO: str = "Division by zero is not allowed. The divisor (b) cannot be zero."
+_ERR_DIVISION_RANGE: str = "Division result {0} is outside the valid range. Consider using smaller input values."
+_ERR_ZERO_TO_ZERO: str = "0^0 is mathematically undefined. Please use non-zero base or exponent."
+_ERR_ZERO_TO_NEGATIVE: str = "0 cannot be raised to a negative power."
+_ERR_EXPONENT_TOO_LARGE: str = f"Exponent {{0}} is too large. Maximum allowed is {MAX_EXPONENT}."
+_ERR_POWER_COMPLEX: str = ("Power operation resulted in a complex number. "
+                           "This occurs with negative base and non-integer exponent.")
+_ERR_POWER_NAN: str = ("Power operation resulted in NaN. "
+                       "This may occur with negative base and non-integer exponent.")
+_ERR_POWER_INFINITE: str = "Power operation resulted in infinity. Result is too large to represent."
+_ERR_POWER_RANGE: str = "Power result {0} exceeds representable range."
+
 def validate_number(value: Union[int, float], param_name: str) -> Union[int, float]:
     """Enhanced validation for numeric inputs with security checks.
 
@@ -34,24 +88,136 @@ def validate_number(value: Union[int, float], param_name: str) -> Union[int, flo
     Raises:
         ValueError: If validation fails
     """
-    # Type check
-    if not isinstance(value, (int, float)):
-        raise ValueError(f"Parameter '{param_name}' must be a number (int or float), "
-                        f"but received {type(value).__name__}: {value}")
-
-    # Check for NaN or Infinity
-    if math.isnan(value):
-        raise ValueError(f"Parameter '{param_name}' cannot be NaN (Not a Number)")
-    if math.isinf(value):
-        raise ValueError(f"Parameter '{param_name}' cannot be infinity")
-
-    # Size limits to prevent overflow/underflow issues
-    if not (MIN_INPUT_VALUE <= value <= MAX_INPUT_VALUE):
-        raise ValueError(f"Parameter '{param_name}' value {value} is outside the allowed range "
-                        f"[{MIN_INPUT_VALUE}, {MAX_INPUT_VALUE}]")
+    # Type check by identity (exact types: bool and other int/float subclasses are rejected)
+    value_type = type(value)
+    if value_type is not int and value_type is not float:
+        raise ValueError(_ERR_NOT_NUMBER.format(param_name, value_type.__name__, value))
+
+    # Check for NaN or Infinity (ints are always finite, and may be too large to convert)
+    if value_type is float and not math.isfinite(value):
+        template = _ERR_NAN if math.isnan(value) else _ERR_INFINITE
+        raise ValueError(template.format(param_name))
+
+    # Size limits to prevent overflow/underflow issues (the range is symmetric)
+    if abs(value) > MAX_INPUT_VALUE:
+        raise ValueError(_ERR_OUT_OF_RANGE.format(param_name, value))
 
     return value
 
+def _divide(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
+    """Checked division of two validated operands."""
+    # Check for division by zero with more descriptive message
+    if b == 0:
+        raise ValueError(_ERR_DIVISION_BY_ZERO)
+
+    result = a / b
+
+    # Check for potential overflow in result; only a divisor smaller than 1 in
+    # magnitude can push the quotient of in-range operands out of range
+    if -1.0 < b < 1.0 and not (MIN_INPUT_VALUE <= result <= MAX_INPUT_VALUE):
+        raise ValueError(_ERR_DIVISION_RANGE.format(result))
+    return result
+
+def _power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, float]:
+    """Checked exponentiation of two validated operands."""
+    # Check for potential issues with 0^0
+    if base == 0 and exponent == 0:
+        raise ValueError(_ERR_ZERO_TO_ZERO)
+    if base == 0 and exponent < 0:
+        raise ValueError(_ERR_ZERO_TO_NEGATIVE)
+
+    # Check for very large exponents that could cause overflow
+    if abs(exponent) > MAX_EXPONENT:
+        raise ValueError(_ERR_EXPONENT_TOO_LARGE.format(exponent))
+
+    result = base ** exponent
+
+    # A normal positive base with |exponent| <= 1 yields a result between
+    # 1/base and base, which is always finite and in range
+    if base >= sys.float_info.min and -1 <= exponent <= 1:
+        return result
+
+    # Check if result is valid
+    if isinstance(result, complex):
+        raise ValueError(_ERR_POWER_COMPLEX)
+    if math.isnan(result):
+        raise ValueError(_ERR_POWER_NAN)
+    if math.isinf(result):
+        raise ValueError(_ERR_POWER_INFINITE)
+
+    # Additional check for overflow
+    if not (MIN_INPUT_VALUE <= result <= MAX_INPUT_VALUE):
+        raise OverflowError(_ERR_POWER_RANGE.format(result))
+    return result
+
+def _make_tool(name: str,
+               kernel: Callable[[float, float], float],
+               op: Callable[[Any, Any], Union[int, float]],
+               params: Tuple[str, str] = ("a", "b")) -> Callable[[Any, Any], Union[int, float]]:
+    """Build the shared implementation behind a two-operand calculator tool.
+
+    The returned function tries the native float kernel first and bails out to
+    ``validate_number`` plus ``op`` whenever the kernel cannot handle the
+    operands: integer-only operands (to keep Python's exact int arithmetic),
+    anything other than exact int or float (including bool), or values the
+    kernel rejected by returning NaN.
+
+    Args:
+        name: Tool name used in log messages
+        kernel: Native float kernel for the operation
+        op: Python implementation applied to validated operands
+        params: Parameter names used in validation error messages
+
+    Returns:
+        A function computing the operation for two operands
+
+    Raises:
+        ValueError: If validation fails (raised by the returned function)
+        OverflowError: If ``op`` rejects the result (raised by the returned function)
+    """
+    first, second = params
+
+    def calculate(a: Any, b: Any) -> Union[int, float]:
+        result = None
+        a_type, b_type = type(a), type(b)
+        # Exact types only: the kernels would silently coerce bool to float
+        if ((a_type is float or b_type is float)
+                and (a_type is float or a_type is int)
+                and (b_type is float or b_type is int)):
+            try:
+                result = kernel(a, b)
+            except (TypeError, ArithmeticError):
+                # Ints too large for a float, or overflow when the kernels run uncompiled
+                pass
+        if result is None or result != result:
+            try:
+                result = op(validate_number(a, first), validate_number(b, second))
+            except Exception as e:
+                logger.error("%s failed: %s", name, e)
+                raise
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s(%r, %r) = %r", name, a, b, result)
+        return result
+
+    return calculate
+
+# Python implementations of each tool for validated operands. add, multiply and
+# subtract are the C-level operator functions, so the table can also drive
+# element-wise helpers such as map(OPERATIONS["add"], xs, ys).
+OPERATIONS: Dict[str, Callable[[Any, Any], Union[int, float]]] = {
+    "add": operator.add,
+    "multiply": operator.mul,
+    "subtract": operator.sub,
+    "divide": _divide,
+    "power": _power,
+}
+
+_add = _make_tool("add", _KERNELS["add"], OPERATIONS["add"])
+_multiply = _make_tool("multiply", _KERNELS["multiply"], OPERATIONS["multiply"])
+_subtract = _make_tool("subtract", _KERNELS["subtract"], OPERATIONS["subtract"])
+_divide_tool = _make_tool("divide", _KERNELS["divide"], OPERATIONS["divide"])
+_power_tool = _make_tool("power", _KERNELS["power"], OPERATIONS["power"], ("base", "exponent"))
+
 @mcp.tool()
 def add(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
     """Add two numbers.
@@ -63,15 +229,7 @@ def add(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
     Returns:
         Sum of the two numbers
     """
-    try:
-        a = validate_number(a, "a")
-        b = validate_number(b, "b")
-        result = a + b
-        logger.info(f"add({a}, {b}) = {result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error in add: {e}")
-        raise
+    return _add(a, b)
 
 @mcp.tool()
 def multiply(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
@@ -84,15 +242,7 @@ def multiply(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
     Returns:
         Product of the two numbers
     """
-    try:
-        a = validate_number(a, "a")
-        b = validate_number(b, "b")
-        result = a * b
-        logger.info(f"multiply({a}, {b}) = {result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error in multiply: {e}")
-        raise
+    return _multiply(a, b)
 
 @mcp.tool()
 def subtract(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
@@ -105,15 +255,7 @@ def subtract(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
     Returns:
         Difference of the two numbers
     """
-    try:
-        a = validate_number(a, "a")
-        b = validate_number(b, "b")
-        result = a - b
-        logger.info(f"subtract({a}, {b}) = {result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error in subtract: {e}")
-        raise
+    return _subtract(a, b)
 
 @mcp.tool()
 def divide(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
@@ -129,29 +271,7 @@ def divide(a: Union[int, float], b: Union[int, float]) -> Union[int, float]:
     Raises:
         ValueError: If divisor is zero or inputs are invalid
     """
-    try:
-        a = validate_number(a, "a")
-        b = validate_number(b, "b")
-
-        # Check for division by zero with more descriptive message
-        if b == 0:
-            raise ValueError("Division by zero is not allowed. The divisor (b) cannot be zero.")
-
-        result = a / b
-
-        # Check for potential overflow in result
-        if not (MIN_INPUT_VALUE <= result <= MAX_INPUT_VALUE):
-            raise ValueError(f"Division result {result} is outside the valid range. "
-                           f"Consider using smaller input values.")
-
-        logger.info(f"divide({a}, {b}) = {result}")
-        return result
-    except ValueError as e:
-        logger.error(f"Validation error in divide: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in divide: {e}")
-        raise ValueError(f"Failed to perform division: {str(e)}")
+    return _divide_tool(a, b)
 
 @mcp.tool()
 def power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, float]:
@@ -168,39 +288,36 @@ def power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, fl
         ValueError: If result would be invalid (overflow, undefined, etc.)
         OverflowError: If result is too large to represent
     """
-    try:
-        base = validate_number(base, "base")
-        exponent = validate_number(exponent, "exponent")
-
-        # Check for potential issues with 0^0
-        if base == 0 and exponent == 0:
-            raise ValueError("0^0 is mathematically undefined. Please use non-zero base or exponent.")
-
-        # Check for very large exponents that could cause overflow
-        if abs(exponent) > 1000:
-            raise ValueError(f"Exponent {exponent} is too large. Maximum allowed is 1000.")
+    return _power_tool(base, exponent)
 
-        result = base ** exponent
+def configure_logging() -> logging.handlers.QueueListener:
+    """Configure logging with better formatting and file output.
 
-        # Check if result is valid
-        if math.isnan(result):
-            raise ValueError(f"Power operation resulted in NaN. This may occur with negative base and non-integer exponent.")
-        if math.isinf(result):
-            raise ValueError(f"Power operation resulted in infinity. Result is too large to represent.")
+    Records are formatted by a QueueHandler and written by a background
+    QueueListener, so tool calls never block on file or console I/O. Only
+    called when the server runs as a script; importing this module (as the
+    in-memory client and the tests do) leaves logging to the importer.
 
-        # Additional check for overflow
-        if not (MIN_INPUT_VALUE <= result <= MAX_INPUT_VALUE):
-            raise OverflowError(f"Power result {result} exceeds representable range.")
-
-        logger.info(f"power({base}, {exponent}) = {result}")
-        return result
-    except (ValueError, OverflowError) as e:
-        logger.error(f"Validation error in power: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in power: {e}")
-        raise ValueError(f"Failed to perform power operation: {str(e)}")
+    Returns:
+        The started listener, stopped automatically at interpreter exit
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(
+        log_queue,
+        logging.FileHandler('calculator_server.log', delay=True),  # Opened on first record
+        logging.StreamHandler()
+    )
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+        force=True  # Replace the plain handler FastMCP installs when it is constructed
+    )
+    log_listener.start()
+    atexit.register(log_listener.stop)  # Flush queued records on shutdown
+    return log_listener
 
 if __name__ == "__main__":
+    configure_logging()
     logger.info("Starting Calculator MCP Server")
-    mcp.run(transport="stdio")  # Use STDIO for local subprocess communication
\ No newline at end of file
+    mcp.run(transport="stdio")  # Use STDIO for local subprocess communication
@@ -1,184 +1,292 @@
 import asyncio
+import hashlib
 import json
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from openai import AzureOpenAI
-
-# Configure logging with better formatting and file output
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('mcp_client.log'),
-        logging.StreamHandler()
-    ]
-)
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import ListToolsResult
+from openai import APIConnectionError, AuthenticationError, AzureOpenAI, NotFoundError
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional; fall back to the standard library parser
+    json_loads = json.loads
+
 logger: logging.Logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Azure OpenAI client, set up by create_azure_client() when the demo runs as a script
+azure_client: Optional[AzureOpenAI] = None
+deployment_name: Optional[str] = None
 
-# Azure OpenAI client setup with error handling
-try:
-    azure_client = AzureOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_version="2024-02-15-preview"  # Fixed to current API version
-    )
-    deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-    if not azure_client.api_key or not deployment_name:
-        logger.warning("Azure OpenAI credentials not found in environment variables")
-        azure_client = None
-        deployment_name = None
-except Exception as e:
-    logger.error(f"Failed to initialize Azure OpenAI client: {e}")
-    azure_client = None
-    deployment_name = None
-
-# Server parameters for STDIO transport
+# Sentinel recording rejected Azure OpenAI credentials or deployment, so later runs skip the AI
+# demo without a round-trip until the credentials change or the sentinel expires
+AUTH_FAILURE_SENTINEL: str = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "mcp-demo",
+    ".mcp_demo_no_azure"
+)
+AUTH_FAILURE_TTL_SECONDS: int = 24 * 60 * 60
+
+def _azure_credentials_fingerprint() -> str:
+    """Hash the Azure OpenAI settings so a sentinel only applies to the credentials it rejected."""
+    settings = "|".join(os.getenv(name) or "" for name in (
+        "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_DEPLOYMENT"
+    ))
+    return hashlib.sha256(settings.encode()).hexdigest()
+
+def azure_auth_recently_failed() -> bool:
+    """Check whether the current credentials were rejected within AUTH_FAILURE_TTL_SECONDS."""
+    try:
+        if time.time() - os.path.getmtime(AUTH_FAILURE_SENTINEL) > AUTH_FAILURE_TTL_SECONDS:
+            return False
+        with open(AUTH_FAILURE_SENTINEL, encoding="utf-8") as f:
+            return f.read().strip() == _azure_credentials_fingerprint()
+    except OSError:
+        return False
+
+def record_azure_auth_failure() -> None:
+    """Write the sentinel for the current credentials; failures to write are only logged."""
+    try:
+        os.makedirs(os.path.dirname(AUTH_FAILURE_SENTINEL), exist_ok=True)
+        with open(AUTH_FAILURE_SENTINEL, "w", encoding="utf-8") as f:
+            f.write(_azure_credentials_fingerprint())
+    except OSError as e:
+        logger.warning("Could not record Azure OpenAI authentication failure: %s", e)
+
+# Server parameters for STDIO transport, used when the server runs as a separate process
+# (set MCP_TRANSPORT=stdio). By default the demos connect to calculator_server in memory.
 server_params = StdioServerParameters(
     command="python",
     args=["calculator_server.py"],
     env=None
 )
 
-async def basic_client_demo():
-    """Basic demo: Connect, list tools, and invoke one directly."""
-    try:
+@asynccontextmanager
+async def open_session() -> AsyncIterator[ClientSession]:
+    """Open an initialized MCP session to the calculator server.
+
+    The server runs in this process unless MCP_TRANSPORT=stdio, so the
+    in-memory transport avoids spawning calculator_server.py and the pipe I/O.
+    """
+    if os.getenv("MCP_TRANSPORT", "memory").lower() == "stdio":
+        logger.info("Initializing STDIO MCP session")
         async with stdio_client(server_params) as (read, write):
             async with ClientSession(read, write) as session:
-                logger.info("Initializing MCP session")
                 await session.initialize()
+                yield session
+    else:
+        # Imported here so STDIO runs never load the server, numba or the kernels
+        from calculator_server import mcp as calculator_mcp
+
+        logger.info("Initializing in-memory MCP session")
+        async with create_connected_server_and_client_session(calculator_mcp) as session:
+            yield session
 
-                # List available tools
-                tools_result = await session.list_tools()
-                print("Available Tools:")
-                for tool in tools_result.tools:
-                    print(f"- {tool.name}: {tool.description or 'No description'}")
+async def basic_client_demo(session: ClientSession, tools_result: ListToolsResult):
+    """Basic demo: List tools and invoke one directly."""
+    try:
+        print("Available Tools:")
+        for tool in tools_result.tools:
+            print(f"- {tool.name}: {tool.description or 'No description'}")
 
-                # Invoke the 'add' tool
-                logger.info("Calling add tool with a=5, b=3")
-                result = await session.call_tool("add", {"a": 5, "b": 3})
-                print(f"\nInvoke 'add(5, 3)' Result: {result.content[0].text}")
+        # Invoke the 'add' tool
+        logger.info("Calling add tool with a=5, b=3")
+        result = await session.call_tool("add", {"a": 5, "b": 3})
+        print(f"\nInvoke 'add(5, 3)' Result: {result.content[0].text}")
     except Exception as e:
-        logger.error(f"Error in basic_client_demo: {e}")
+        logger.error("Error in basic_client_demo: %s", e)
         print(f"Error in basic demo: {e}")
 
-async def ai_integrated_demo(user_query: str):
-    """AI-integrated demo: Use Azure OpenAI to process a query, which may invoke tools."""
+def build_tool_schemas(tools_result: ListToolsResult) -> List[Dict[str, Any]]:
+    """Convert MCP tool listings into the OpenAI ``tools=`` format.
+
+    The schemas are static for the life of a session, so callers build them
+    once and reuse the list for every query.
+    """
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": t.name,
+                "description": t.description or "",
+                "parameters": t.inputSchema
+            }
+        } for t in tools_result.tools
+    ]
+
+async def ai_integrated_demo(session: ClientSession, tools: List[Dict[str, Any]], user_query: str):
+    """AI-integrated demo: Use Azure OpenAI to process a query, which may invoke tools.
+
+    Args:
+        session: Initialized MCP session used to run tool calls
+        tools: Tool schemas from build_tool_schemas()
+        user_query: Natural language query for the model
+    """
     if not azure_client or not deployment_name:
         print("Azure OpenAI not configured. Skipping AI demo.")
         return
 
     try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                logger.info("Initializing MCP session for AI demo")
-                await session.initialize()
+        messages = [{"role": "user", "content": user_query}]
+
+        # Call Azure OpenAI API with tools
+        logger.info("Sending query to Azure OpenAI: %s", user_query)
+        response = azure_client.chat.completions.create(
+            model=deployment_name,
+            messages=messages,
+            tools=tools,
+            tool_choice="auto"
+        )
+
+        assistant_message = response.choices[0].message
+        messages.append(assistant_message)
+
+        # Handle tool calls
+        if assistant_message.tool_calls:
+            logger.info("Processing %d tool calls", len(assistant_message.tool_calls))
+            # The calculator tools are independent, so invoke them concurrently;
+            # the session matches each response to its request id
+            tool_calls = assistant_message.tool_calls
+            for tool_call in tool_calls:
+                logger.info("Calling tool: %s with args: %s", tool_call.function.name, tool_call.function.arguments)
+            # Parse every argument list before starting any call, so malformed arguments
+            # never leave an already-created call un-awaited
+            tool_args = [json_loads(tool_call.function.arguments) for tool_call in tool_calls]
+            # Collect failures instead of abandoning the remaining calls at the first one
+            tool_results = await asyncio.gather(*(
+                session.call_tool(tool_call.function.name, args)
+                for tool_call, args in zip(tool_calls, tool_args)
+            ), return_exceptions=True)
+            for tool_result in tool_results:
+                if isinstance(tool_result, BaseException):
+                    raise tool_result
+
+            # Add tool results to messages in the order the model requested them
+            for tool_call, tool_result in zip(tool_calls, tool_results):
+                messages.append({
+                    "role": "tool",
+                    "content": tool_result.content[0].text,
+                    "tool_call_id": tool_call.id
+                })
 
-                # Get tool schemas
-                tools_result = await session.list_tools()
-                tools = [
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": t.name,
-                            "description": t.description or "",
-                            "parameters": t.inputSchema
-                        }
-                    } for t in tools_result.tools
-                ]
-
-                messages = [{"role": "user", "content": user_query}]
-
-                # Call Azure OpenAI API with tools
-                logger.info(f"Sending query to Azure OpenAI: {user_query}")
-                response = azure_client.chat.completions.create(
-                    model=deployment_name,
-                    messages=messages,
-                    tools=tools,
-                    tool_choice="auto"
-                )
-
-                assistant_message = response.choices[0].message
-                messages.append(assistant_message)
-
-                # Handle tool calls
-                if assistant_message.tool_calls:
-                    logger.info(f"Processing {len(assistant_message.tool_calls)} tool calls")
-                    for tool_call in assistant_message.tool_calls:
-                        tool_name = tool_call.function.name
-                        tool_args = json.loads(tool_call.function.arguments)
-
-                        logger.info(f"Calling tool: {tool_name} with args: {tool_args}")
-                        # Invoke the tool
-                        tool_result = await session.call_tool(tool_name, tool_args)
-                        tool_result_content = tool_result.content[0].text
-
-                        # Add tool result to messages
-                        messages.append({
-                            "role": "tool",
-                            "content": tool_result_content,
-                            "tool_call_id": tool_call.id
-                        })
-
-                    # Get final response from Azure OpenAI
-                    logger.info("Getting final response from Azure OpenAI")
-                    final_response = azure_client.chat.completions.create(
-                        model=deployment_name,
-                        messages=messages
-                    )
-                    print("=== Assistant's Response ===")
-                    print(final_response.choices[0].message.content)
-                else:
-                    print("=== Assistant's Response ===")
-                    print(assistant_message.content)
+            # Get final response from Azure OpenAI
+            logger.info("Getting final response from Azure OpenAI")
+            final_response = azure_client.chat.completions.create(
+                model=deployment_name,
+                messages=messages
+            )
+            print("=== Assistant's Response ===")
+            print(final_response.choices[0].message.content)
+        else:
+            print("=== Assistant's Response ===")
+            print(assistant_message.content)
+    except (AuthenticationError, NotFoundError, APIConnectionError):
+        # Configuration problems are reported (and recorded) by main()
+        raise
     except Exception as e:
-        logger.error(f"Error in ai_integrated_demo: {e}")
+        logger.error("Error in ai_integrated_demo: %s", e)
         print(f"Error in AI demo: {e}")
 
+def print_available_tools() -> None:
+    """Print the calculator tools when the AI demo is skipped."""
+    print("\nThe MCP client is working correctly! The available tools are:")
+    print("- add: Add two numbers")
+    print("- multiply: Multiply two numbers")
+    print("- subtract: Subtract second number from first")
+    print("- divide: Divide first number by second")
+    print("- power: Raise base to the power of exponent")
+
 async def main():
-    # Run basic demo
-    print("Running basic MCP client demo...")
-    await basic_client_demo()
-    print("\nBasic demo completed successfully!\n")
-
-    # Check if Azure OpenAI is properly configured
-    if azure_client and deployment_name:
-        try:
-            # Test if we can create a simple completion
-            logger.info("Testing Azure OpenAI credentials")
-            test_response = azure_client.chat.completions.create(
-                model=deployment_name,
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
-            )
-            # If we get here, credentials are likely real
-            print("Azure OpenAI credentials appear to be configured. Running AI-integrated demo...")
-            user_query = "What is 8 multiplied by 9?"
-            await ai_integrated_demo(user_query)
-        except Exception as e:
-            logger.warning(f"Azure OpenAI test failed: {e}")
-            print(f"Azure OpenAI credentials not properly configured: {e}")
-            print("Skipping AI-integrated demo. To enable it, update your .env file with real Azure OpenAI credentials.")
-            print("\nThe MCP client is working correctly! The available tools are:")
-            print("- add: Add two numbers")
-            print("- multiply: Multiply two numbers")
-            print("- subtract: Subtract second number from first")
-            print("- divide: Divide first number by second")
-            print("- power: Raise base to the power of exponent")
-    else:
-        print("Azure OpenAI not configured.")
-        print("\nThe MCP client is working correctly! The available tools are:")
-        print("- add: Add two numbers")
-        print("- multiply: Multiply two numbers")
-        print("- subtract: Subtract second number from first")
-        print("- divide: Divide first number by second")
-        print("- power: Raise base to the power of exponent")
+    # One session serves both demos, so the connection and handshake happen once
+    try:
+        async with open_session() as session:
+            # List tools once and share them (and their OpenAI schemas) between both demos
+            tools_result = await session.list_tools()
+            tool_schemas = build_tool_schemas(tools_result)
+
+            # Run basic demo
+            print("Running basic MCP client demo...")
+            await basic_client_demo(session, tools_result)
+            print("\nBasic demo completed successfully!\n")
+
+            # Check if Azure OpenAI is properly configured. There is no credential probe:
+            # the first real request reports rejected credentials.
+            if not azure_client or not deployment_name:
+                print("Azure OpenAI not configured.")
+                print_available_tools()
+            elif azure_auth_recently_failed():
+                logger.info("Skipping AI demo: credentials rejected recently (%s)", AUTH_FAILURE_SENTINEL)
+                print("Azure OpenAI rejected these credentials or this deployment within the last 24 hours.")
+                print("Skipping AI-integrated demo. Update your .env file with real Azure OpenAI settings "
+                      f"or delete {AUTH_FAILURE_SENTINEL} to retry.")
+                print_available_tools()
+            else:
+                try:
+                    print("Running AI-integrated demo...")
+                    user_query = "What is 8 multiplied by 9?"
+                    await ai_integrated_demo(session, tool_schemas, user_query)
+                except (AuthenticationError, NotFoundError) as e:
+                    # Rejected credentials or an unknown deployment won't fix themselves
+                    logger.warning("Azure OpenAI rejected the configuration: %s", e)
+                    record_azure_auth_failure()
+                    print(f"Azure OpenAI credentials not properly configured: {e}")
+                    print("Skipping AI-integrated demo. To enable it, update your .env file with real Azure OpenAI credentials.")
+                    print_available_tools()
+                except APIConnectionError as e:
+                    # Not recorded: the network may simply be down for this run
+                    logger.warning("Could not reach Azure OpenAI: %s", e)
+                    print(f"Could not reach the Azure OpenAI endpoint: {e}")
+                    print("Skipping AI-integrated demo. Check AZURE_OPENAI_ENDPOINT in your .env file and your network connection.")
+                    print_available_tools()
+    except Exception as e:
+        logger.error("Error in MCP session: %s", e)
+        print(f"Error connecting to the MCP server: {e}")
+
+def configure_logging() -> None:
+    """Configure logging with better formatting and file output.
+
+    Only called when the client runs as a script, so importing this module
+    (as the tests do) neither creates mcp_client.log nor touches logging.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('mcp_client.log', delay=True),  # Opened on first record
+            logging.StreamHandler()
+        ]
+    )
+
+def create_azure_client() -> Tuple[Optional[AzureOpenAI], Optional[str]]:
+    """Create the Azure OpenAI client from the environment.
+
+    Returns:
+        The client and deployment name, or (None, None) if they are not configured
+    """
+    try:
+        new_client = AzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_version="2024-02-15-preview"  # Fixed to current API version
+        )
+        deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+        if not new_client.api_key or not deployment:
+            logger.warning("Azure OpenAI credentials not found in environment variables")
+            return None, None
+        return new_client, deployment
+    except Exception as e:
+        logger.error("Failed to initialize Azure OpenAI client: %s", e)
+        return None, None
 
 if __name__ == "__main__":
+    configure_logging()
+    load_dotenv()  # Load environment variables
+    azure_client, deployment_name = create_azure_client()
     logger.info("Starting MCP Client Demo")
     asyncio.run(main())
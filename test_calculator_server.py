@@ -1,6 +1,31 @@
+import importlib.util
+import logging
+import math
+import os
+import shutil
+import sys
+import types
+
 import pytest
+from calculator_kernel_sources import KERNELS_HASH, KERNEL_SOURCES
 from calculator_server import add, multiply, subtract, divide, power, validate_number
 
+def load_server_copy():
+    """Import a fresh copy of calculator_server so kernel selection runs again."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calculator_server.py")
+    spec = importlib.util.spec_from_file_location("calculator_server_copy", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def fake_extension(kernels_hash):
+    """Build a stand-in for the calculator_kernels extension."""
+    module = types.ModuleType("calculator_kernels")
+    module.kernels_hash = lambda: kernels_hash
+    for name, kernel in KERNEL_SOURCES.items():
+        setattr(module, name, lambda a, b, kernel=kernel: kernel(a, b))
+    return module
+
 class TestValidateNumber:
     def test_valid_int(self):
         assert validate_number(5, "test") == 5
@@ -16,6 +41,18 @@ class TestValidateNumber:
         with pytest.raises(ValueError, match=r"Parameter 'test' must be a number \(int or float\), but received list"):
             validate_number([1, 2, 3], "test")
 
+    def test_invalid_bool(self):
+        with pytest.raises(ValueError, match=r"but received bool"):
+            validate_number(True, "test")
+
+    def test_infinity(self):
+        with pytest.raises(ValueError, match="cannot be infinity"):
+            validate_number(float("-inf"), "test")
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError, match="outside the allowed range"):
+            validate_number(-10**309, "test")
+
 class TestAdd:
     def test_add_integers(self):
         assert add(2, 3) == 5
@@ -70,6 +107,10 @@ class TestDivide:
     def test_divide_negative(self):
         assert divide(-6, 2) == -3
 
+    def test_divide_small_divisor_overflow(self):
+        with pytest.raises(ValueError, match="outside the valid range"):
+            divide(1e308, 0.5)
+
 class TestPower:
     def test_power_integers(self):
         assert power(2, 3) == 8
@@ -86,5 +127,116 @@ class TestPower:
     def test_power_fractional_exponent(self):
         assert power(4, 0.5) == 2.0
 
+    def test_power_bounded_exponent(self):
+        assert power(5, -1) == 0.2
+        assert power(1e-300, -1) == pytest.approx(1e300)
+
+    def test_power_zero_negative_exponent(self):
+        with pytest.raises(ValueError, match="negative power"):
+            power(0, -1)
+
+    def test_power_complex_result(self):
+        with pytest.raises(ValueError, match="complex number"):
+            power(-8, 0.5)
+
+class TestErrorLogging:
+    def test_failed_call_is_logged(self, caplog):
+        with caplog.at_level(logging.ERROR, logger="calculator_server"):
+            with pytest.raises(ValueError):
+                divide(5, 0)
+        assert "divide failed: Division by zero is not allowed" in caplog.text
+
+class TestKernelFallback:
+    def test_float_kernel_result(self):
+        assert add(0.5, 0.25) == 0.75
+
+    def test_integers_stay_exact(self):
+        assert add(2**60, 1) == 2**60 + 1
+
+    @pytest.mark.parametrize("tool", [add, subtract, multiply, divide, power])
+    def test_bool_mixed_with_float_rejected(self, tool):
+        with pytest.raises(ValueError, match="but received bool"):
+            tool(True, 2.0)
+
+    def test_nan_rejected(self):
+        with pytest.raises(ValueError, match="cannot be NaN"):
+            add(float("nan"), 1.0)
+
+    def test_divide_by_float_zero(self):
+        with pytest.raises(ValueError, match="Division by zero is not allowed"):
+            divide(5.0, 0.0)
+
+    def test_power_large_exponent(self):
+        with pytest.raises(ValueError, match="Exponent 2000.0 is too large"):
+            power(2.0, 2000.0)
+
+    def test_power_integer_exponent(self):
+        assert power(1.5, 5) == 7.59375
+        assert power(-2.0, 63) == -2.0**63
+
+    @pytest.mark.parametrize("base, exponent", [(1.1, 10.0), (-2.7, 33.0), (0.3, 64.0), (2.9, 0.37)])
+    def test_power_matches_builtin_pow(self, base, exponent):
+        assert power(base, exponent) == base ** exponent
+
+    def test_power_integer_exponent_overflow(self):
+        with pytest.raises(OverflowError):
+            power(1e200, 2)
+
+    def test_power_overflow(self):
+        with pytest.raises(OverflowError):
+            power(10.0, 400.0)
+
+class TestKernelLoading:
+    def test_plain_python_by_default(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "calculator_kernels", None)
+        monkeypatch.delenv("CALCULATOR_NUMBA_JIT", raising=False)
+        server = load_server_copy()
+        assert server._KERNELS == KERNEL_SOURCES
+        assert server.add(1.5, 2) == 3.5
+
+    def test_jit_opt_in_without_numba(self, monkeypatch, caplog):
+        monkeypatch.setitem(sys.modules, "calculator_kernels", None)
+        monkeypatch.setitem(sys.modules, "numba", None)
+        monkeypatch.setenv("CALCULATOR_NUMBA_JIT", "1")
+        server = load_server_copy()
+        assert server._KERNELS == KERNEL_SOURCES
+        assert "numba is not installed" in caplog.text
+
+    def test_prebuilt_extension_used(self, monkeypatch):
+        extension = fake_extension(KERNELS_HASH)
+        monkeypatch.setitem(sys.modules, "calculator_kernels", extension)
+        server = load_server_copy()
+        assert server._KERNELS["add"] is extension.add
+        assert server.divide(1.0, 4) == 0.25
+
+    def test_stale_extension_ignored(self, monkeypatch, caplog):
+        extension = fake_extension(KERNELS_HASH ^ 1)
+        monkeypatch.setitem(sys.modules, "calculator_kernels", extension)
+        monkeypatch.delenv("CALCULATOR_NUMBA_JIT", raising=False)
+        server = load_server_copy()
+        assert server._KERNELS == KERNEL_SOURCES
+        assert "stale calculator_kernels" in caplog.text
+
+    # Compiles a real C extension with numba.pycc, which takes seconds; opt in with CALCULATOR_BUILD_TESTS=1
+    @pytest.mark.skipif(os.getenv("CALCULATOR_BUILD_TESTS") != "1", reason="set CALCULATOR_BUILD_TESTS=1 to run")
+    @pytest.mark.filterwarnings("ignore::DeprecationWarning")
+    @pytest.mark.filterwarnings("ignore::PendingDeprecationWarning")
+    def test_build_extension(self, monkeypatch, tmp_path):
+        try:
+            import numba.pycc  # noqa: F401
+        except ImportError:
+            pytest.skip("numba.pycc is not available")
+        if shutil.which("cc") is None and shutil.which("gcc") is None:
+            pytest.skip("no C compiler available")
+        import build_kernels
+        build_kernels.build(str(tmp_path))
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, "calculator_kernels", raising=False)
+        import calculator_kernels
+        assert calculator_kernels.kernels_hash() == KERNELS_HASH
+        assert calculator_kernels.add(1.5, 2.0) == 3.5
+        assert math.isnan(calculator_kernels.divide(1.0, 0.0))
+        assert calculator_kernels.power(1.1, 10.0) == 1.1 ** 10.0
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+import client
+from client import azure_auth_recently_failed, record_azure_auth_failure
+
+@pytest.fixture
+def sentinel(tmp_path, monkeypatch):
+    path = str(tmp_path / "mcp-demo" / ".mcp_demo_no_azure")
+    monkeypatch.setattr(client, "AUTH_FAILURE_SENTINEL", path)
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com/")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT", "deployment")
+    return path
+
+class TestAuthFailureSentinel:
+    def test_no_sentinel(self, sentinel):
+        assert not azure_auth_recently_failed()
+
+    def test_recorded_failure(self, sentinel):
+        record_azure_auth_failure()
+        assert os.path.exists(sentinel)
+        assert azure_auth_recently_failed()
+
+    def test_expired_failure(self, sentinel):
+        record_azure_auth_failure()
+        expired = time.time() - client.AUTH_FAILURE_TTL_SECONDS - 60
+        os.utime(sentinel, (expired, expired))
+        assert not azure_auth_recently_failed()
+
+    def test_changed_credentials(self, sentinel, monkeypatch):
+        record_azure_auth_failure()
+        monkeypatch.setenv("AZURE_OPENAI_API_KEY", "new-key")
+        assert not azure_auth_recently_failed()
+
+    def test_unwritable_directory(self, tmp_path, monkeypatch, caplog):
+        # A regular file where the cache directory should be makes os.makedirs fail
+        blocker = tmp_path / "not-a-directory"
+        blocker.write_text("")
+        monkeypatch.setattr(client, "AUTH_FAILURE_SENTINEL", str(blocker / ".mcp_demo_no_azure"))
+        record_azure_auth_failure()
+        assert "Could not record Azure OpenAI authentication failure" in caplog.text
+        assert not azure_auth_recently_failed()
+
+class TestOpenSession:
+    @pytest.mark.asyncio
+    async def test_in_memory_session(self, monkeypatch):
+        monkeypatch.delenv("MCP_TRANSPORT", raising=False)
+        async with client.open_session() as session:
+            tools_result = await session.list_tools()
+            assert sorted(t.name for t in tools_result.tools) == ["add", "divide", "multiply", "power", "subtract"]
+            result = await session.call_tool("add", {"a": 5, "b": 3})
+            assert result.content[0].text == "8"
+
+class FakeSession:
+    """MCP session stand-in whose earlier calls finish later."""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = failing
+        self.requested = []
+        self.completed = []
+
+    def call_tool(self, name, arguments):
+        self.requested.append(name)
+        return self._call_tool(name)
+
+    async def _call_tool(self, name):
+        await asyncio.sleep(self.delays[name])
+        if name in self.failing:
+            raise RuntimeError(f"{name} failed")
+        self.completed.append(name)
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{name} result")])
+
+class FakeCompletions:
+    """Chat completions stand-in that requests three tool calls, then answers."""
+
+    def __init__(self, arguments=None):
+        self.arguments = arguments or {}
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if len(self.requests) == 1:
+            tool_calls = [
+                SimpleNamespace(id=f"call_{name}", function=SimpleNamespace(
+                    name=name, arguments=self.arguments.get(name, '{"a": 1, "b": 2}')
+                ))
+                for name in ("add", "multiply", "subtract")
+            ]
+            message = SimpleNamespace(content=None, tool_calls=tool_calls)
+        else:
+            message = SimpleNamespace(content="done", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+class TestAiIntegratedDemo:
+    @pytest.mark.asyncio
+    async def test_tool_results_keep_request_order(self, monkeypatch, capsys):
+        completions = FakeCompletions()
+        monkeypatch.setattr(client, "azure_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        monkeypatch.setattr(client, "deployment_name", "deployment")
+        session = FakeSession({"add": 0.03, "multiply": 0.02, "subtract": 0.0})
+
+        await client.ai_integrated_demo(session, [], "What is 1 + 2?")
+
+        # The calls ran concurrently and finished in reverse order...
+        assert session.completed == ["subtract", "multiply", "add"]
+        # ...but the tool messages follow the order the model requested
+        tool_messages = [m for m in completions.requests[1]["messages"] if isinstance(m, dict) and m["role"] == "tool"]
+        assert [m["tool_call_id"] for m in tool_messages] == ["call_add", "call_multiply", "call_subtract"]
+        assert [m["content"] for m in tool_messages] == ["add result", "multiply result", "subtract result"]
+        assert "done" in capsys.readouterr().out
+
+    @pytest.mark.asyncio
+    async def test_malformed_arguments_start_no_calls(self, monkeypatch, capsys):
+        completions = FakeCompletions({"multiply": '{"a": 1,'})
+        monkeypatch.setattr(client, "azure_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        monkeypatch.setattr(client, "deployment_name", "deployment")
+        session = FakeSession({"add": 0.0, "multiply": 0.0, "subtract": 0.0})
+
+        await client.ai_integrated_demo(session, [], "What is 1 + 2?")
+
+        assert session.requested == []
+        assert len(completions.requests) == 1
+        assert "Error in AI demo" in capsys.readouterr().out
+
+    @pytest.mark.asyncio
+    async def test_failed_call_lets_siblings_finish(self, monkeypatch, capsys):
+        completions = FakeCompletions()
+        monkeypatch.setattr(client, "azure_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        monkeypatch.setattr(client, "deployment_name", "deployment")
+        session = FakeSession({"add": 0.0, "multiply": 0.02, "subtract": 0.03}, failing=("add",))
+
+        await client.ai_integrated_demo(session, [], "What is 1 + 2?")
+
+        assert session.completed == ["multiply", "subtract"]
+        assert len(completions.requests) == 1
+        assert "Error in AI demo: add failed" in capsys.readouterr().out
+
+class TestMain:
+    @pytest.mark.asyncio
+    async def test_without_azure(self, monkeypatch, capsys):
+        monkeypatch.delenv("MCP_TRANSPORT", raising=False)
+        monkeypatch.setattr(client, "azure_client", None)
+        monkeypatch.setattr(client, "deployment_name", None)
+
+        await client.main()
+
+        out = capsys.readouterr().out
+        assert "Invoke 'add(5, 3)' Result: 8" in out
+        assert "Basic demo completed successfully!" in out
+        assert "Azure OpenAI not configured." in out
+        assert "The available tools are:" in out
+        assert "Error connecting to the MCP server" not in out
+
+if __name__ == "__main__":
+    pytest.main([__file__])